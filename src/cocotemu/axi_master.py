@@ -2,7 +2,7 @@
 
 from cocotbext.axi import AxiLiteMaster, AxiLiteBus
 
-from .protocol import MmioOp, MmioRequest
+from .protocol import MmioOp, MmioRequest, VAL_STRUCTS
 
 
 class CocotemuAxiMaster:
@@ -19,10 +19,10 @@ class CocotemuAxiMaster:
         For reads, returns the read data as an int.
         For writes, performs the write and returns 0.
         """
+        codec = VAL_STRUCTS[req.size]
         if req.op == MmioOp.READ:
             data = await self._master.read(req.addr, req.size)
-            return int.from_bytes(data.data, byteorder="little")
+            return codec.unpack(data.data)[0]
         else:
-            val_bytes = req.val.to_bytes(req.size, byteorder="little")
-            await self._master.write(req.addr, val_bytes)
+            await self._master.write(req.addr, codec.pack(req.val))
             return 0
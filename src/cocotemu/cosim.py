@@ -8,7 +8,7 @@ import logging
 
 import cocotb
 from cocotb.clock import Clock
-from cocotb.triggers import RisingEdge, ClockCycles
+from cocotb.triggers import RisingEdge, Timer
 
 from .axi_master import CocotemuAxiMaster
 from .qemu_bridge import QemuBridge
@@ -17,10 +17,13 @@ from .gpio_protocol import GpioDir, GpioSignal
 
 logger = logging.getLogger(__name__)
 
+CLK_PERIOD_NS = 10
+
 
 async def _reset(dut, cycles=5):
     dut.aresetn.value = 0
-    await ClockCycles(dut.aclk, cycles)
+    # Clock is already running: one Timer instead of a trigger per edge
+    await Timer(cycles * CLK_PERIOD_NS, units="ns")
     dut.aresetn.value = 1
     await RisingEdge(dut.aclk)
 
@@ -32,15 +35,22 @@ async def cosim_test(dut):
     COCOTEMU_SOCK      - Unix socket path (default /tmp/cocotemu.sock)
     COCOTEMU_GPIO_SOCK - GPIO socket path (default /tmp/cocotemu_gpio.sock)
     COCOTEMU_GPIO      - set to "0" to disable GPIO bridge
+    COCOTEMU_CPUS      - "recv,sim" CPU pair to pin the QEMU bridge threads to
+    COCOTEMU_VERBOSE   - set to "1" to log every AXI transaction
     """
-    clock = Clock(dut.aclk, 10, units="ns")
+    clock = Clock(dut.aclk, CLK_PERIOD_NS, units="ns")
     cocotb.start_soon(clock.start())
     await _reset(dut)
 
     axi = CocotemuAxiMaster(dut)
     sock_path = os.environ.get("COCOTEMU_SOCK", "/tmp/cocotemu.sock")
 
-    bridge = QemuBridge(axi.execute, sock_path=sock_path)
+    cpus = os.environ.get("COCOTEMU_CPUS")
+    cpu_affinity = _parse_cpus(cpus) if cpus else None
+
+    bridge = QemuBridge(axi.execute, sock_path=sock_path,
+                        cpu_affinity=cpu_affinity,
+                        verbose=os.environ.get("COCOTEMU_VERBOSE") == "1")
     logger.info("Starting QEMU bridge on %s", sock_path)
 
     # --- GPIO bridge ---
@@ -49,14 +59,28 @@ async def cosim_test(dut):
         if gpio_signals:
             gpio_sock = os.environ.get("COCOTEMU_GPIO_SOCK",
                                        "/tmp/cocotemu_gpio.sock")
-            gpio_bridge = GpioBridge(gpio_signals, sock_path=gpio_sock)
+            gpio_bridge = GpioBridge(gpio_signals, sock_path=gpio_sock,
+                                     clock=dut.aclk)
             logger.info("Starting GPIO bridge on %s with %d signals",
                         gpio_sock, len(gpio_signals))
             cocotb.start_soon(gpio_bridge.start())
+            # Its socket thread must exist before QemuBridge.start() pins
+            # this thread, or it would inherit the sim CPU
+            await gpio_bridge.await_ready()
 
     await bridge.start()
 
 
+def _parse_cpus(value: str) -> tuple[int, int]:
+    """Parse COCOTEMU_CPUS ("recv,sim") into a CPU pair."""
+    try:
+        recv_cpu, sim_cpu = (int(c) for c in value.split(","))
+    except ValueError:
+        raise ValueError("COCOTEMU_CPUS must be two comma-separated CPU "
+                         f"numbers (recv,sim), got {value!r}") from None
+    return recv_cpu, sim_cpu
+
+
 def _detect_gpio(dut) -> list[GpioSignal]:
     """Auto-detect GPIO ports on the DUT."""
     signals = []
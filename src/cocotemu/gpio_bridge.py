@@ -1,48 +1,91 @@
 # GPIO bridge: Unix socket server exposing DUT GPIO signals.
 #
 # Threading model (mirrors QemuBridge):
-#   - Thread 1 (sim): cocotb poll loop picks requests from _req_queue,
-#     reads/writes signal handles, detects output changes, queues notifications
-#   - Thread 2 (OS): socket accept/recv, puts parsed requests on _req_queue,
-#     blocks on _resp_queue, drains _notify_queue for async VALUE pushes
-
+#   - Thread 1 (sim): cocotb poll loop picks requests from _req_queue and
+#     reads/writes signal handles; one Edge watcher task per subscribed output
+#     queues NOTIFY frames on every change
+#   - Thread 2 (OS): selector-driven accept/recv, puts (op, payload, future)
+#     on _req_queue, blocks on each future, drains _notify_queue for async
+#     NOTIFY pushes whenever the sim thread pokes the wakeup socketpair
+
+import concurrent.futures
 import os
 import queue
+import selectors
 import socket
-import struct
 import threading
 import logging
 
 import cocotb
-from cocotb.triggers import Timer
+from cocotb.triggers import Edge, RisingEdge, Timer
 
-from .gpio_protocol import GpioDir, GpioOp, GpioResp, GpioErr, GpioSignal
+from .gpio_protocol import (GpioDir, GpioOp, GpioResp, GpioErr, GpioSignal,
+                            PAYLOAD_LEN, VALUE_STRUCT, U32_STRUCT)
+from .sockopt import tune_socket
 
 logger = logging.getLogger(__name__)
 
+# Queued by the OS thread when a client goes away, so the sim side can drop
+# that client's subscriptions
+_DISCONNECT = object()
+
 
 class GpioBridge:
     """Exposes DUT GPIO signals over a Unix socket.
 
-    Unlike QemuBridge, re-accepts clients after disconnect.
+    Always re-accepts clients after disconnect (QemuBridge does so only
+    with reaccept=True).
     """
 
     def __init__(self, signals: list[GpioSignal],
-                 sock_path: str = "/tmp/cocotemu_gpio.sock"):
+                 sock_path: str = "/tmp/cocotemu_gpio.sock", clock=None):
+        """
+        Args:
+            signals: GPIO signals to expose, in LIST order
+            sock_path: Unix socket path to listen on
+            clock: DUT clock handle; SYNC waits for its next rising edge
+                (or one poll interval if None)
+        """
         self._signals = signals
+        self._clock = clock
+        # Signal list is fixed for the bridge's lifetime
+        self._list_resp = self._build_list_resp()
         self._sock_path = sock_path
         self._running = False
+        # Set once the poll loop has exited and stopped serving _req_queue
+        self._closed = False
+        # Set by the OS thread once the socket is listening
+        self.ready = threading.Event()
         self._server_sock = None
-        self._req_queue: queue.Queue = queue.Queue()
-        self._resp_queue: queue.Queue = queue.Queue()
-        self._notify_queue: queue.Queue = queue.Queue()
-        # Subscriptions: set of signal indices
-        self._subscriptions: set[int] = set()
-        # Last-known values for change detection
-        self._last_values: dict[int, int] = {}
-
-    async def start(self, poll_ns: int = 100):
-        """Start the bridge — call from a cocotb coroutine."""
+        self._rxbuf = bytearray()
+        self._req_queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._notify_queue: queue.SimpleQueue = queue.SimpleQueue()
+        # Written by the sim thread / stop() to wake the OS thread's select()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        # Subscriptions: Edge watcher task per signal index, None if unsubscribed
+        self._watchers: list[cocotb.Task | None] = [None] * len(signals)
+        # Opcode -> handler(payload) -> response bytes (SYNC is handled
+        # in start(), since it has to wait in sim time)
+        self._dispatch = {
+            GpioOp.LIST: self._handle_list,
+            GpioOp.GET: self._handle_get,
+            GpioOp.SET: self._handle_set,
+            GpioOp.SUBSCRIBE: self._handle_subscribe,
+            GpioOp.UNSUB: self._handle_unsub,
+        }
+
+    async def start(self, poll_ns: int = 100, max_poll_ns: int | None = None):
+        """Start the bridge — call from a cocotb coroutine.
+
+        Args:
+            poll_ns: sim-time polling interval in nanoseconds (default 100).
+            max_poll_ns: while no requests arrive the interval doubles up to
+                this ceiling; it drops back to poll_ns as soon as a request
+                is seen. Defaults to poll_ns (no backoff): clients wait for
+                each reply, so a backed-off Timer delays every next request.
+        """
         self._running = True
 
         t = threading.Thread(target=self._recv_loop, daemon=True)
@@ -50,220 +93,287 @@ class GpioBridge:
 
         cocotb.log.info("GpioBridge: poll loop started (poll_ns=%d)", poll_ns)
 
-        while self._running:
-            # Process one request per iteration (if any)
-            try:
-                req = self._req_queue.get_nowait()
-            except queue.Empty:
-                # No request — sample outputs for change detection
-                self._sample_outputs()
-                await Timer(poll_ns, units="ns")
-                continue
-
-            if req is None:
-                break
+        if max_poll_ns is None:
+            max_poll_ns = poll_ns
+        idle_ns = poll_ns
+        try:
+            while self._running:
+                # Drain every queued request in the current sim step
+                try:
+                    req = self._req_queue.get_nowait()
+                except queue.Empty:
+                    await Timer(idle_ns, units="ns")
+                    idle_ns = min(idle_ns * 2, max_poll_ns)
+                    continue
+                idle_ns = poll_ns
 
-            op, payload = req
-            self._handle_request(op, payload)
+                if req is None:
+                    break
+                if req is _DISCONNECT:
+                    self._unsubscribe_all()
+                    continue
 
-            # Also sample after handling (SET may have changed something)
-            self._sample_outputs()
-            await Timer(poll_ns, units="ns")
+                op, payload, fut = req
+                if op == GpioOp.SYNC:
+                    # Requests behind the barrier run only after the edge
+                    if self._clock is not None:
+                        await RisingEdge(self._clock)
+                    else:
+                        await Timer(poll_ns, units="ns")
+                    fut.set_result(bytes([GpioResp.ACK]))
+                    continue
+                fut.set_result(self._handle_request(op, payload))
+                if op == GpioOp.SET:
+                    # Let the write take effect before serving requests that
+                    # may observe it
+                    await Timer(poll_ns, units="ns")
+        finally:
+            # Nothing serves the queue from here on; release any waiter
+            self._closed = True
+            self._cancel_pending()
 
+        self._unsubscribe_all()
         cocotb.log.info("GpioBridge: poll loop exited")
 
+    async def await_ready(self, timeout: float = 5.0):
+        """Wait until the socket accepts connections.
+
+        Call after scheduling start(); raises TimeoutError if the socket is
+        not listening within timeout seconds.
+        """
+        if not await cocotb.external(self.ready.wait)(timeout):
+            raise TimeoutError(f"GpioBridge: {self._sock_path} not listening "
+                               f"after {timeout}s")
+
     def stop(self):
         """Signal the bridge to shut down."""
         self._running = False
         self._req_queue.put(None)
-        if self._server_sock:
+        self._wake()
+
+    async def _watch(self, idx: int):
+        """Queue a NOTIFY frame on every change of a subscribed output."""
+        handle = self._signals[idx].handle
+        # Bind everything once; the loop body runs on every signal change
+        edge = Edge(handle)
+        pack = VALUE_STRUCT.pack
+        put = self._notify_queue.put
+        wake = self._wake
+        while True:
+            await edge
+            put(pack(GpioResp.NOTIFY, idx, int(handle.value)))
+            wake()
+
+    def _cancel_pending(self):
+        """Cancel the futures of requests the poll loop will never serve."""
+        while True:
             try:
-                self._server_sock.close()
-            except OSError:
-                pass
+                req = self._req_queue.get_nowait()
+            except queue.Empty:
+                break
+            if req is not None and req is not _DISCONNECT:
+                req[2].cancel()
+
+    def _unsubscribe_all(self):
+        """Stop every watcher and discard notifications nobody will read."""
+        for idx, task in enumerate(self._watchers):
+            if task is not None:
+                task.kill()
+                self._watchers[idx] = None
+        while True:
+            try:
+                self._notify_queue.get_nowait()
+            except queue.Empty:
+                break
 
-    def _sample_outputs(self):
-        """Check subscribed output signals for changes, queue notifications."""
-        for idx in list(self._subscriptions):
-            sig = self._signals[idx]
-            cur = int(sig.handle.value)
-            prev = self._last_values.get(idx)
-            if prev is None:
-                self._last_values[idx] = cur
-                continue
-            if cur != prev:
-                self._last_values[idx] = cur
-                # Queue async VALUE notification
-                resp = struct.pack("<BBi", GpioResp.VALUE, idx, cur)
-                self._notify_queue.put(resp)
-
-    def _handle_request(self, op: int, payload: bytes):
-        """Process a single request in sim context, put response on _resp_queue."""
-        if op == GpioOp.LIST:
-            self._resp_queue.put(self._build_list_resp())
-        elif op == GpioOp.GET:
-            idx = payload[0]
-            if idx >= len(self._signals):
-                self._resp_queue.put(
-                    bytes([GpioResp.ERR, GpioErr.BAD_INDEX]))
-                return
-            sig = self._signals[idx]
-            if sig.direction != GpioDir.OUT:
-                self._resp_queue.put(
-                    bytes([GpioResp.ERR, GpioErr.WRONG_DIRECTION]))
-                return
-            val = int(sig.handle.value)
-            self._resp_queue.put(
-                struct.pack("<BBi", GpioResp.VALUE, idx, val))
-        elif op == GpioOp.SET:
-            idx = payload[0]
-            if idx >= len(self._signals):
-                self._resp_queue.put(
-                    bytes([GpioResp.ERR, GpioErr.BAD_INDEX]))
-                return
-            sig = self._signals[idx]
-            if sig.direction != GpioDir.IN:
-                self._resp_queue.put(
-                    bytes([GpioResp.ERR, GpioErr.WRONG_DIRECTION]))
-                return
-            val = struct.unpack_from("<I", payload, 1)[0]
-            sig.handle.value = val
-            self._resp_queue.put(bytes([GpioResp.ACK]))
-        elif op == GpioOp.SUBSCRIBE:
-            idx = payload[0]
-            if idx >= len(self._signals):
-                self._resp_queue.put(
-                    bytes([GpioResp.ERR, GpioErr.BAD_INDEX]))
-                return
-            sig = self._signals[idx]
-            if sig.direction != GpioDir.OUT:
-                self._resp_queue.put(
-                    bytes([GpioResp.ERR, GpioErr.WRONG_DIRECTION]))
-                return
-            self._subscriptions.add(idx)
-            self._last_values[idx] = int(sig.handle.value)
-            self._resp_queue.put(bytes([GpioResp.ACK]))
-        elif op == GpioOp.UNSUB:
-            idx = payload[0]
-            if idx >= len(self._signals):
-                self._resp_queue.put(
-                    bytes([GpioResp.ERR, GpioErr.BAD_INDEX]))
-                return
-            self._subscriptions.discard(idx)
-            self._last_values.pop(idx, None)
-            self._resp_queue.put(bytes([GpioResp.ACK]))
-        else:
-            self._resp_queue.put(
-                bytes([GpioResp.ERR, GpioErr.BAD_OPCODE]))
+    def _handle_request(self, op: int, payload: bytes) -> bytes:
+        """Process a single request in sim context and return the response."""
+        return self._dispatch.get(op, self._handle_bad_op)(payload)
+
+    def _handle_list(self, payload: bytes) -> bytes:
+        return self._list_resp
+
+    def _handle_get(self, payload: bytes) -> bytes:
+        idx = payload[0]
+        if idx >= len(self._signals):
+            return bytes([GpioResp.ERR, GpioErr.BAD_INDEX])
+        sig = self._signals[idx]
+        if sig.direction != GpioDir.OUT:
+            return bytes([GpioResp.ERR, GpioErr.WRONG_DIRECTION])
+        val = int(sig.handle.value)
+        return VALUE_STRUCT.pack(GpioResp.VALUE, idx, val)
+
+    def _handle_set(self, payload: bytes) -> bytes:
+        idx = payload[0]
+        if idx >= len(self._signals):
+            return bytes([GpioResp.ERR, GpioErr.BAD_INDEX])
+        sig = self._signals[idx]
+        if sig.direction != GpioDir.IN:
+            return bytes([GpioResp.ERR, GpioErr.WRONG_DIRECTION])
+        val = U32_STRUCT.unpack_from(payload, 1)[0]
+        sig.handle.value = val
+        return bytes([GpioResp.ACK])
+
+    def _handle_subscribe(self, payload: bytes) -> bytes:
+        idx = payload[0]
+        if idx >= len(self._signals):
+            return bytes([GpioResp.ERR, GpioErr.BAD_INDEX])
+        sig = self._signals[idx]
+        if sig.direction != GpioDir.OUT:
+            return bytes([GpioResp.ERR, GpioErr.WRONG_DIRECTION])
+        if self._watchers[idx] is None:
+            self._watchers[idx] = cocotb.start_soon(self._watch(idx))
+        return bytes([GpioResp.ACK])
+
+    def _handle_unsub(self, payload: bytes) -> bytes:
+        idx = payload[0]
+        if idx >= len(self._signals):
+            return bytes([GpioResp.ERR, GpioErr.BAD_INDEX])
+        task = self._watchers[idx]
+        if task is not None:
+            task.kill()
+            self._watchers[idx] = None
+        return bytes([GpioResp.ACK])
+
+    def _handle_bad_op(self, payload: bytes) -> bytes:
+        return bytes([GpioResp.ERR, GpioErr.BAD_OPCODE])
 
     def _build_list_resp(self) -> bytes:
-        """Build LIST_RESP message."""
-        buf = bytearray([GpioResp.LIST_RESP, len(self._signals)])
+        """Build LIST_RESP message from pre-encoded per-signal entries."""
+        blobs = []
         for sig in self._signals:
             name_bytes = sig.name.encode("ascii")
-            buf.append(len(name_bytes))
-            buf.extend(name_bytes)
-            buf.append(sig.width)
-            buf.append(sig.direction)
-        return bytes(buf)
+            blobs.append(bytes([len(name_bytes)]) + name_bytes +
+                         bytes([sig.width, sig.direction]))
+        header = bytes([GpioResp.LIST_RESP, len(self._signals)])
+        return header + b"".join(blobs)
 
     # ----- OS thread -----
 
     def _recv_loop(self):
         """Blocking socket accept loop. Runs in an OS thread."""
-        if os.path.exists(self._sock_path):
+        try:
             os.unlink(self._sock_path)
+        except FileNotFoundError:
+            pass
 
         self._server_sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
         self._server_sock.bind(self._sock_path)
         self._server_sock.listen(1)
-        self._server_sock.settimeout(1.0)
-        print(f"GpioBridge: listening on {self._sock_path}", flush=True)
+        self.ready.set()
+        logger.info("GpioBridge: listening on %s", self._sock_path)
 
+        sel = selectors.DefaultSelector()
+        sel.register(self._server_sock, selectors.EVENT_READ)
+        sel.register(self._wake_r, selectors.EVENT_READ)
         try:
             while self._running:
-                try:
-                    conn, _ = self._server_sock.accept()
-                except socket.timeout:
+                ready = {key.fileobj for key, _ in sel.select()}
+                if self._wake_r in ready:
+                    self._clear_wake()
+                if self._server_sock not in ready or not self._running:
                     continue
-                print("GpioBridge: client connected", flush=True)
+                conn, _ = self._server_sock.accept()
+                tune_socket(conn)
+                logger.info("GpioBridge: client connected")
                 self._handle_client(conn)
-                print("GpioBridge: client disconnected", flush=True)
+                logger.info("GpioBridge: client disconnected")
                 # Clear subscriptions for next client
-                self._subscriptions.clear()
-                self._last_values.clear()
+                self._req_queue.put(_DISCONNECT)
                 # Re-accept (unlike QemuBridge, we keep going)
         finally:
+            sel.close()
             self._server_sock.close()
-            if os.path.exists(self._sock_path):
+            self._wake_r.close()
+            self._wake_w.close()
+            try:
                 os.unlink(self._sock_path)
+            except FileNotFoundError:
+                pass
 
     def _handle_client(self, conn: socket.socket):
-        """Process messages from a single client connection."""
-        conn.settimeout(0.5)
+        """Process messages from a single client connection.
+
+        Blocks in select() on the client socket and the wakeup socket, so
+        notifications go out as soon as the sim side queues them.
+        """
+        self._rxbuf = bytearray()
+        sel = selectors.DefaultSelector()
+        sel.register(conn, selectors.EVENT_READ)
+        sel.register(self._wake_r, selectors.EVENT_READ)
         try:
             while self._running:
-                # Drain async notifications first
-                self._drain_notifications(conn)
-
-                # Read opcode byte
-                try:
-                    data = conn.recv(1)
-                except socket.timeout:
+                ready = {key.fileobj for key, _ in sel.select()}
+                if self._wake_r in ready:
+                    self._clear_wake()
+                    self._drain_notifications(conn)
+                if conn not in ready:
                     continue
-                if not data:
-                    break
-
-                op = data[0]
-
-                # Read remaining payload based on opcode
-                if op == GpioOp.LIST:
-                    payload = b""
-                elif op in (GpioOp.GET, GpioOp.SUBSCRIBE, GpioOp.UNSUB):
-                    payload = self._recv_exact(conn, 1)
-                    if payload is None:
-                        break
-                elif op == GpioOp.SET:
-                    payload = self._recv_exact(conn, 5)  # idx(1) + value(4)
-                    if payload is None:
-                        break
-                else:
-                    # Unknown opcode — still queue it for ERR response
-                    payload = b""
-
-                # Put on sim queue, wait for response
-                self._req_queue.put((op, payload))
-                resp = self._resp_queue.get()
-                conn.sendall(resp)
 
+                chunk = conn.recv(4096)
+                if not chunk:
+                    break
+                self._rxbuf += chunk
+
+                # Queue every complete frame before waiting on responses
+                futs = []
+                for op, payload in self._parse_frames():
+                    fut = concurrent.futures.Future()
+                    self._req_queue.put((op, payload, fut))
+                    futs.append(fut)
+                if self._closed:
+                    # The poll loop exited and may have drained the queue
+                    # before these arrived
+                    for fut in futs:
+                        fut.cancel()
+                if futs:
+                    conn.sendall(b"".join([fut.result() for fut in futs]))
+
+        except concurrent.futures.CancelledError:
+            logger.info("GpioBridge: poll loop stopped, ending session")
         except (ConnectionError, OSError) as exc:
             logger.warning("GpioBridge: connection error: %s", exc)
         finally:
+            sel.close()
             conn.close()
 
+    def _parse_frames(self) -> list[tuple[int, bytes]]:
+        """Split complete (op, payload) frames off the front of _rxbuf."""
+        buf = self._rxbuf
+        frames = []
+        pos = 0
+        while pos < len(buf):
+            op = buf[pos]
+            # Unknown opcodes carry no payload and get an ERR response
+            end = pos + 1 + PAYLOAD_LEN.get(op, 0)
+            if end > len(buf):
+                break  # partial frame, wait for more data
+            frames.append((op, bytes(buf[pos + 1:end])))
+            pos = end
+        del buf[:pos]
+        return frames
+
     def _drain_notifications(self, conn: socket.socket):
-        """Send all pending async VALUE notifications."""
+        """Send all pending NOTIFY frames in one write."""
+        pending = []
         while True:
             try:
-                data = self._notify_queue.get_nowait()
+                pending.append(self._notify_queue.get_nowait())
             except queue.Empty:
                 break
-            try:
-                conn.sendall(data)
-            except (ConnectionError, OSError):
-                break
+        if pending:
+            conn.sendall(b"".join(pending))
 
-    def _recv_exact(self, sock: socket.socket, n: int) -> bytes | None:
-        """Receive exactly n bytes. Returns None on disconnect."""
-        buf = bytearray()
-        while len(buf) < n:
-            if not self._running:
-                return None
-            try:
-                chunk = sock.recv(n - len(buf))
-            except socket.timeout:
-                continue
-            if not chunk:
-                return None
-            buf.extend(chunk)
-        return bytes(buf)
+    def _wake(self):
+        """Wake the OS thread out of select(). Safe to call from any thread."""
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass  # already awake (buffer full) or shut down
+
+    def _clear_wake(self):
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
@@ -1,10 +1,12 @@
 # Synchronous Python client for the GPIO bridge.
 
+import collections
 import socket
-import struct
 import time
 
-from .gpio_protocol import GpioDir, GpioOp, GpioResp, GpioErr
+from .gpio_protocol import (GpioDir, GpioOp, GpioResp, GpioErr,
+                            VALUE_STRUCT, U32_STRUCT)
+from .sockopt import tune_socket
 
 
 class GpioClient:
@@ -13,6 +15,9 @@ class GpioClient:
     def __init__(self, sock_path: str = "/tmp/cocotemu_gpio.sock"):
         self._sock_path = sock_path
         self._sock: socket.socket | None = None
+        self._rxbuf = bytearray()
+        # NOTIFY frames that arrived while waiting for a command reply
+        self._notifications: collections.deque[tuple[int, int]] = collections.deque()
         self._signals: list[dict] = []  # [{name, width, direction}, ...]
 
     def connect(self, retries: int = 50, delay: float = 0.05):
@@ -30,6 +35,9 @@ class GpioClient:
             raise ConnectionError(
                 f"Could not connect to {self._sock_path} after {retries} retries")
 
+        tune_socket(self._sock)
+        self._rxbuf = bytearray()
+        self._notifications.clear()
         self._sock.settimeout(2.0)
         # Auto-fetch signal list
         self._signals = self._list()
@@ -63,85 +71,151 @@ class GpioClient:
         """Send LIST, parse LIST_RESP."""
         self._sock.sendall(bytes([GpioOp.LIST]))
         # Read LIST_RESP header: op + count
-        hdr = self._recv_exact(2)
-        assert hdr[0] == GpioResp.LIST_RESP
-        count = hdr[1]
-        signals = []
+        self._need(2)
+        if self._rxbuf[0] != GpioResp.LIST_RESP:
+            raise RuntimeError(f"LIST: unexpected response 0x{self._rxbuf[0]:02X}")
+        count = self._rxbuf[1]
+        # Walk the entry lengths until the whole response is buffered
+        end = 2
         for _ in range(count):
-            name_len = self._recv_exact(1)[0]
-            name = self._recv_exact(name_len).decode("ascii")
-            width = self._recv_exact(1)[0]
-            direction = GpioDir(self._recv_exact(1)[0])
-            signals.append({"name": name, "width": width, "direction": direction})
+            self._need(end + 1)
+            end += 1 + self._rxbuf[end] + 2  # name_len + name + width + dir
+        self._need(end)
+
+        signals = []
+        with memoryview(self._rxbuf) as mv:
+            pos = 2
+            for _ in range(count):
+                name_len = mv[pos]
+                name = str(mv[pos + 1:pos + 1 + name_len], "ascii")
+                pos += 1 + name_len
+                width = mv[pos]
+                direction = GpioDir(mv[pos + 1])
+                pos += 2
+                signals.append({"name": name, "width": width, "direction": direction})
+        del self._rxbuf[:end]
         return signals
 
     def get(self, name_or_idx) -> int:
         """Read a signal value (output signals only)."""
         idx = self._resolve(name_or_idx)
         self._sock.sendall(bytes([GpioOp.GET, idx]))
-        op = self._recv_exact(1)[0]
+        self._stash_notifications()
+        op = self._rxbuf[0]
         if op == GpioResp.ERR:
-            code = self._recv_exact(1)[0]
+            code = self._recv_exact(2)[1]
             raise RuntimeError(f"GET error: {GpioErr(code).name}")
-        assert op == GpioResp.VALUE
-        rest = self._recv_exact(5)  # sig_idx(1) + value(4)
-        val = struct.unpack_from("<I", rest, 1)[0]
-        return val
+        if op != GpioResp.VALUE:
+            raise RuntimeError(f"GET: unexpected response 0x{op:02X}")
+        return self._take_value()[1]
+
+    def set(self, name_or_idx, value: int, sync: bool = False):
+        """Drive a signal value (input signals only).
 
-    def set(self, name_or_idx, value: int):
-        """Drive a signal value (input signals only)."""
+        With sync=True, SET is followed by SYNC in the same write and the
+        call returns only once the sim has clocked the new value in.
+        """
         idx = self._resolve(name_or_idx)
-        msg = struct.pack("<BBi", GpioOp.SET, idx, value)
+        msg = VALUE_STRUCT.pack(GpioOp.SET, idx, value & 0xFFFFFFFF)
+        if sync:
+            msg += bytes([GpioOp.SYNC])
         self._sock.sendall(msg)
-        resp = self._recv_exact(1)
-        if resp[0] == GpioResp.ERR:
-            err_code = self._recv_exact(1)
-            raise RuntimeError(f"SET error: {GpioErr(err_code[0]).name}")
-        assert resp[0] == GpioResp.ACK
+        try:
+            self._expect_ack("SET")
+        finally:
+            # The SYNC reply follows even if SET was rejected
+            if sync:
+                self._expect_ack("SYNC")
+
+    def sync(self):
+        """Block until the sim has taken a clock edge past all prior requests."""
+        self._sock.sendall(bytes([GpioOp.SYNC]))
+        self._expect_ack("SYNC")
 
     def subscribe(self, name_or_idx):
         """Subscribe to change notifications on an output signal."""
         idx = self._resolve(name_or_idx)
         self._sock.sendall(bytes([GpioOp.SUBSCRIBE, idx]))
-        resp = self._recv_exact(1)
-        if resp[0] == GpioResp.ERR:
-            err_code = self._recv_exact(1)
-            raise RuntimeError(f"SUBSCRIBE error: {GpioErr(err_code[0]).name}")
-        assert resp[0] == GpioResp.ACK
+        self._expect_ack("SUBSCRIBE")
 
     def unsubscribe(self, name_or_idx):
         """Unsubscribe from change notifications."""
         idx = self._resolve(name_or_idx)
         self._sock.sendall(bytes([GpioOp.UNSUB, idx]))
-        resp = self._recv_exact(1)
-        if resp[0] == GpioResp.ERR:
-            err_code = self._recv_exact(1)
-            raise RuntimeError(f"UNSUB error: {GpioErr(err_code[0]).name}")
-        assert resp[0] == GpioResp.ACK
+        self._expect_ack("UNSUB")
 
     def recv_notification(self, timeout: float = 2.0) -> tuple[int, int]:
-        """Wait for an async VALUE notification.
+        """Wait for an async NOTIFY push.
+
+        Notifications that arrived while a command was waiting for its reply
+        are returned first, without touching the socket.
 
         Returns (sig_idx, value).
         """
+        if self._notifications:
+            return self._notifications.popleft()
         old_timeout = self._sock.gettimeout()
         self._sock.settimeout(timeout)
         try:
-            op = self._recv_exact(1)[0]
-            assert op == GpioResp.VALUE
-            rest = self._recv_exact(5)  # sig_idx(1) + value(4)
-            idx = rest[0]
-            val = struct.unpack_from("<I", rest, 1)[0]
-            return idx, val
+            self._need(1)
+            self._check_notification()
+            return self._take_value()
         finally:
             self._sock.settimeout(old_timeout)
 
-    def _recv_exact(self, n: int) -> bytes:
-        """Receive exactly n bytes."""
-        buf = bytearray()
+    def _check_notification(self):
+        if self._rxbuf[0] != GpioResp.NOTIFY:
+            raise RuntimeError(
+                f"notification: unexpected message 0x{self._rxbuf[0]:02X}")
+
+    def _expect_ack(self, what: str):
+        """Consume an ACK reply; raise on ERR or any other response."""
+        self._stash_notifications()
+        resp = self._recv_exact(1)
+        if resp[0] == GpioResp.ERR:
+            err_code = self._recv_exact(1)
+            raise RuntimeError(f"{what} error: {GpioErr(err_code[0]).name}")
+        if resp[0] != GpioResp.ACK:
+            raise RuntimeError(f"{what}: unexpected response 0x{resp[0]:02X}")
+
+    def _stash_notifications(self):
+        """Move NOTIFY frames at the head of the buffer to the stash.
+
+        Async pushes have their own opcode, so the first frame that is not
+        NOTIFY is the command reply, however many pushes are queued ahead
+        of it.
+        """
+        while True:
+            self._need(1)
+            if self._rxbuf[0] != GpioResp.NOTIFY:
+                return
+            self._notifications.append(self._take_value())
+
+    def _take_value(self) -> tuple[int, int]:
+        """Consume one VALUE/NOTIFY frame: op(1) + sig_idx(1) + value(4)."""
+        self._need(6)
+        idx = self._rxbuf[1]
+        val = U32_STRUCT.unpack_from(self._rxbuf, 2)[0]
+        del self._rxbuf[:6]
+        return idx, val
+
+    def _need(self, n: int):
+        """Block until the receive buffer holds at least n bytes.
+
+        The buffer is refilled with one large recv, so a whole response
+        (or several) costs a single syscall. Parsers read fields straight
+        out of self._rxbuf and delete what they consumed.
+        """
+        buf = self._rxbuf
         while len(buf) < n:
-            chunk = self._sock.recv(n - len(buf))
+            chunk = self._sock.recv(65536)
             if not chunk:
                 raise ConnectionError("Server disconnected")
-            buf.extend(chunk)
-        return bytes(buf)
+            buf += chunk
+
+    def _recv_exact(self, n: int) -> bytes:
+        """Receive exactly n bytes."""
+        self._need(n)
+        data = bytes(self._rxbuf[:n])
+        del self._rxbuf[:n]
+        return data
@@ -1,8 +1,14 @@
 # GPIO bridge wire protocol — binary, compact.
 
 import enum
+import struct
 from dataclasses import dataclass
 
+# op(1) + idx(1) + value(4): SET request, VALUE and NOTIFY frames; the
+# value is unsigned, matching the U32 decode on the receiving side
+VALUE_STRUCT = struct.Struct("<BBI")
+U32_STRUCT = struct.Struct("<I")
+
 
 class GpioDir(enum.IntEnum):
     IN = 0x00   # DUT input  — client can SET
@@ -15,13 +21,26 @@ class GpioOp(enum.IntEnum):
     SET = 0x03
     SUBSCRIBE = 0x04
     UNSUB = 0x05
+    SYNC = 0x06  # ACKed after the sim has taken a clock edge
+
+
+# Request payload length (bytes after the opcode) for each opcode
+PAYLOAD_LEN = {
+    GpioOp.LIST: 0,
+    GpioOp.GET: 1,        # idx
+    GpioOp.SET: 5,        # idx(1) + value(4)
+    GpioOp.SUBSCRIBE: 1,  # idx
+    GpioOp.UNSUB: 1,      # idx
+    GpioOp.SYNC: 0,
+}
 
 
 class GpioResp(enum.IntEnum):
     LIST_RESP = 0x81
-    VALUE = 0x82
+    VALUE = 0x82   # GET reply
     ACK = 0x83
     ERR = 0x84
+    NOTIFY = 0x85  # async change push for a subscribed output, VALUE layout
 
 
 class GpioErr(enum.IntEnum):
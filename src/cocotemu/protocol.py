@@ -5,17 +5,26 @@ import struct
 from dataclasses import dataclass
 
 HDR_FMT = "<BBQQ"
-HDR_SIZE = struct.calcsize(HDR_FMT)  # 18
+HDR_STRUCT = struct.Struct(HDR_FMT)
+HDR_SIZE = HDR_STRUCT.size  # 18
 
 WRITE_ACK = b"\x01"
 
+# Little-endian codecs for MMIO data, keyed by access size
+VAL_STRUCTS = {
+    1: struct.Struct("<B"),
+    2: struct.Struct("<H"),
+    4: struct.Struct("<I"),
+    8: struct.Struct("<Q"),
+}
+
 
 class MmioOp(enum.IntEnum):
     READ = 0
     WRITE = 1
 
 
-@dataclass
+@dataclass(slots=True)
 class MmioRequest:
     op: MmioOp
     size: int      # 1, 2, 4, or 8
@@ -23,9 +32,14 @@ class MmioRequest:
     val: int = 0   # uint64 (only meaningful for WRITE)
 
     def pack(self) -> bytes:
-        return struct.pack(HDR_FMT, self.op, self.size, self.addr, self.val)
+        return HDR_STRUCT.pack(self.op, self.size, self.addr, self.val)
 
     @classmethod
     def unpack(cls, data: bytes) -> "MmioRequest":
-        op, size, addr, val = struct.unpack(HDR_FMT, data)
-        return cls(op=MmioOp(op), size=size, addr=addr, val=val)
+        return cls.unpack_from(data)
+
+    @classmethod
+    def unpack_from(cls, buf, offset: int = 0) -> "MmioRequest":
+        """Decode a header in place from any buffer, without slicing it out."""
+        op, size, addr, val = HDR_STRUCT.unpack_from(buf, offset)
+        return cls(MmioOp(op), size, addr, val)
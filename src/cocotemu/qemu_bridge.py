@@ -1,171 +1,357 @@
 # QEMU bridge: Unix socket server that translates mmio_stub messages to AXI transactions
 
+import concurrent.futures
 import os
 import queue
+import selectors
 import socket
 import threading
+import time
 import logging
 
 import cocotb
 from cocotb.triggers import Timer
 
-from .protocol import HDR_SIZE, MmioOp, MmioRequest, WRITE_ACK
+from .protocol import HDR_SIZE, MmioOp, MmioRequest, VAL_STRUCTS, WRITE_ACK
+from .sockopt import tune_socket
 
 logger = logging.getLogger(__name__)
 
+# Kernel buffer size for the QEMU socket, so MMIO bursts drain in few wakeups
+SOCK_BUF_SIZE = 1 << 20
+
+# Upper bound on requests queued per batch, and so on write ACKs held back
+# for coalescing
+MAX_PENDING_ACKS = 32
+
+# Seconds without traffic, after at least one message, before the session
+# is considered finished
+IDLE_TIMEOUT_S = 6.0
+
+# Read-data packers and value masks per access size, bound once
+_PACK = {size: codec.pack for size, codec in VAL_STRUCTS.items()}
+_MASK = {size: (1 << (size * 8)) - 1 for size in VAL_STRUCTS}
+
+
+def _pin_current_thread(core):
+    """Pin the calling thread to one CPU (no-op without sched_setaffinity)."""
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {core})
+
 
 class QemuBridge:
     """Listens on a Unix socket for QEMU mmio-stub connections.
 
     Threading model (queue-based, avoids @cocotb.function deadlocks):
-      - Thread 1 (sim): cocotb poll loop picks requests from _req_queue,
-        drives AXI, puts results on _resp_queue
-      - Thread 2 (OS): _recv_loop does socket recv, puts MmioRequest on
-        _req_queue, blocks on _resp_queue for the result, sends response
+      - Thread 1 (sim): cocotb poll loop picks (MmioRequest, Future) pairs
+        from _req_queue, drives AXI, resolves the future with the result
+      - Thread 2 (OS): _recv_loop does socket recv, puts (MmioRequest, Future)
+        on _req_queue for every buffered request, blocks on the futures in
+        order, sends the responses
     """
 
-    def __init__(self, axi_handler, sock_path="/tmp/cocotemu.sock"):
+    def __init__(self, axi_handler, sock_path="/tmp/cocotemu.sock",
+                 cpu_affinity=None, reaccept=False, verbose=False):
         """
         Args:
             axi_handler: async callable(MmioRequest) -> int
             sock_path: Unix socket path to listen on
+            cpu_affinity: optional (recv_core, sim_core) pair; pins the socket
+                thread and the cocotb thread to those CPUs so the two keep
+                their shared queue/socket state warm. Both CPUs must be in
+                the process's affinity set (ValueError). Ignored on platforms
+                without os.sched_setaffinity (e.g. macOS). Threads the
+                cocotb thread spawns after start() inherit sim_core, so
+                start other bridges before this one.
+            reaccept: keep accepting new clients after one disconnects. By
+                default the first client's disconnect ends the session and
+                start() returns, which is what a single QEMU run expects.
+            verbose: log every AXI transaction at INFO level
         """
         self._axi_handler = axi_handler
         self._sock_path = sock_path
+        if cpu_affinity is not None and len(cpu_affinity) != 2:
+            raise ValueError("cpu_affinity must be a (recv_core, sim_core) "
+                             f"pair, got {cpu_affinity!r}")
+        if cpu_affinity is not None and hasattr(os, "sched_getaffinity"):
+            allowed = os.sched_getaffinity(0)
+            bad = [core for core in cpu_affinity if core not in allowed]
+            if bad:
+                raise ValueError(f"cpu_affinity {cpu_affinity!r}: CPUs {bad} "
+                                 f"not in this process's set {sorted(allowed)}")
+        self._cpu_affinity = cpu_affinity
+        self._reaccept = reaccept
+        self._verbose = verbose
         self._running = False
+        # Set once the poll loop has exited and stopped serving _req_queue
+        self._closed = False
+        # Set by the OS thread once the socket is listening
+        self.ready = threading.Event()
         self._server_sock = None
-        self._req_queue = queue.Queue()
-        self._resp_queue = queue.Queue()
+        # Connected client, so stop() can cut it off from another thread
+        self._active_conn = None
+        self._rx_buf = bytearray()
+        self._last_rx_ts = 0.0
+        self._req_queue = queue.SimpleQueue()
+        # One selector for the listen/client socket and the wakeup socketpair
+        self._sel = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
 
-    async def start(self, poll_ns=100):
+    async def start(self, poll_ns=100, max_poll_ns=None):
         """Start the bridge — call from a cocotb coroutine.
 
         Args:
             poll_ns: sim-time polling interval in nanoseconds (default 100).
+            max_poll_ns: while no requests arrive the interval doubles up to
+                this ceiling; it drops back to poll_ns as soon as a request
+                is seen. Defaults to poll_ns (no backoff): QEMU sends each
+                MMIO only after the previous response, so a backed-off Timer
+                adds sim time to every round trip.
         """
         self._running = True
 
         # Start recv loop in a daemon thread
         t = threading.Thread(target=self._recv_loop, daemon=True)
         t.start()
+        if self._cpu_affinity is not None:
+            _pin_current_thread(self._cpu_affinity[1])
 
         cocotb.log.info("QemuBridge: poll loop started (poll_ns=%d)", poll_ns)
 
         # Sim-time poll loop: check queue each cycle, drive AXI, return results
-        while self._running:
+        verbose = self._verbose
+        if max_poll_ns is None:
+            max_poll_ns = poll_ns
+        idle_ns = poll_ns
+        try:
+            while self._running:
+                # Drain every queued request in the current sim step
+                try:
+                    req = self._req_queue.get_nowait()
+                except queue.Empty:
+                    await Timer(idle_ns, units="ns")
+                    idle_ns = min(idle_ns * 2, max_poll_ns)
+                    continue
+                idle_ns = poll_ns
+                if req is None:
+                    break
+                req, fut = req
+                if verbose:
+                    cocotb.log.info("QemuBridge: AXI %s addr=0x%X size=%d val=0x%X",
+                                    req.op.name, req.addr, req.size, req.val)
+                result = await self._axi_handler(req)
+                if verbose:
+                    cocotb.log.info("QemuBridge: AXI result=0x%X", result)
+                fut.set_result(result)
+        finally:
+            # Nothing serves the queue from here on; release any waiter
+            self._closed = True
+            self._cancel_pending()
+
+        cocotb.log.info("QemuBridge: poll loop exited")
+
+    def _cancel_pending(self):
+        """Cancel the futures of requests the poll loop will never serve."""
+        while True:
             try:
                 req = self._req_queue.get_nowait()
             except queue.Empty:
-                await Timer(poll_ns, units="ns")
-                continue
-            if req is None:
                 break
-            cocotb.log.info("QemuBridge: AXI %s addr=0x%X size=%d val=0x%X",
-                            req.op.name, req.addr, req.size, req.val)
-            result = await self._axi_handler(req)
-            cocotb.log.info("QemuBridge: AXI result=0x%X", result)
-            self._resp_queue.put(result)
+            if req is not None:
+                req[1].cancel()
 
-        cocotb.log.info("QemuBridge: poll loop exited")
+    async def await_ready(self, timeout=5.0):
+        """Wait until the socket accepts connections.
+
+        Call after scheduling start(); raises TimeoutError if the socket is
+        not listening within timeout seconds.
+        """
+        if not await cocotb.external(self.ready.wait)(timeout):
+            raise TimeoutError(f"QemuBridge: {self._sock_path} not listening "
+                               f"after {timeout}s")
 
     def stop(self):
         """Signal the bridge to shut down."""
         self._running = False
         # Unblock the poll loop
         self._req_queue.put(None)
-        if self._server_sock:
+        # Unblock the OS thread's select(), and the client with an EOF
+        self._wake()
+        conn = self._active_conn
+        if conn is not None:
             try:
-                self._server_sock.close()
+                conn.shutdown(socket.SHUT_RDWR)
             except OSError:
                 pass
 
     def _recv_loop(self):
-        """Blocking socket accept + recv loop. Runs in an OS thread."""
+        """Selector-driven socket accept + recv loop. Runs in an OS thread."""
+        if self._cpu_affinity is not None:
+            _pin_current_thread(self._cpu_affinity[0])
         # Clean up stale socket
-        if os.path.exists(self._sock_path):
+        try:
             os.unlink(self._sock_path)
+        except FileNotFoundError:
+            pass
 
         self._server_sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
         self._server_sock.bind(self._sock_path)
+        tune_socket(self._server_sock, sndbuf=SOCK_BUF_SIZE, rcvbuf=SOCK_BUF_SIZE)
         self._server_sock.listen(1)
-        self._server_sock.settimeout(1.0)
-        print(f"QemuBridge: listening on {self._sock_path}", flush=True)
+        self.ready.set()
+        logger.info("QemuBridge: listening on %s", self._sock_path)
 
+        self._sel.register(self._server_sock, selectors.EVENT_READ)
+        self._sel.register(self._wake_r, selectors.EVENT_READ)
         try:
             while self._running:
-                try:
-                    conn, _ = self._server_sock.accept()
-                except socket.timeout:
+                ready = {key.fileobj for key, _ in self._sel.select()}
+                if self._wake_r in ready:
+                    self._clear_wake()
+                if self._server_sock not in ready or not self._running:
                     continue
-                print("QemuBridge: client connected", flush=True)
+                conn, _ = self._server_sock.accept()
+                tune_socket(conn, sndbuf=SOCK_BUF_SIZE, rcvbuf=SOCK_BUF_SIZE)
+                logger.info("QemuBridge: client connected")
                 self._handle_client(conn)
-                print("QemuBridge: client disconnected", flush=True)
+                logger.info("QemuBridge: client disconnected")
+                if self._reaccept:
+                    continue
                 # Signal the poll loop that the session is over
                 self._running = False
                 self._req_queue.put(None)
         finally:
+            self._sel.close()
             self._server_sock.close()
-            if os.path.exists(self._sock_path):
+            self._wake_r.close()
+            self._wake_w.close()
+            try:
                 os.unlink(self._sock_path)
+            except FileNotFoundError:
+                pass
 
     def _handle_client(self, conn: socket.socket):
-        """Process messages from a single QEMU client connection."""
-        conn.settimeout(2.0)
+        """Process messages from a single QEMU client connection.
+
+        The client socket replaces the listen socket in the selector for the
+        duration of the session, so select() only returns for client data,
+        stop(), or after IDLE_TIMEOUT_S of silence.
+        """
+        self._active_conn = conn
+        self._rx_buf = bytearray()
+        self._sel.unregister(self._server_sock)
+        self._sel.register(conn, selectors.EVENT_READ)
         msg_count = 0
-        idle_timeouts = 0
-        max_idle = 3  # exit after 3 consecutive timeouts (6s idle)
+        pending_acks = 0
+        self._last_rx_ts = time.monotonic()
         try:
             while self._running:
-                data = self._recv_exact(conn, HDR_SIZE)
-                if data is None:
-                    print("QemuBridge: recv returned None (client closed)", flush=True)
-                    break
-                if data == b"":
-                    # Timeout with no data — check for idle
-                    idle_timeouts += 1
-                    if msg_count > 0 and idle_timeouts >= max_idle:
-                        print(f"QemuBridge: idle for {idle_timeouts * 2}s after "
-                              f"{msg_count} messages, assuming firmware done", flush=True)
+                try:
+                    req = self._recv_request(conn)
+                except socket.timeout:
+                    idle_s = time.monotonic() - self._last_rx_ts
+                    if msg_count > 0 and idle_s > IDLE_TIMEOUT_S:
+                        logger.info("QemuBridge: idle for %.0fs after %d messages, "
+                                    "assuming firmware done", idle_s, msg_count)
                         break
                     continue
-                idle_timeouts = 0
-                req = MmioRequest.unpack(data)
-                msg_count += 1
-                print(f"QemuBridge: rx #{msg_count}: {req}", flush=True)
-
-                # Put request on queue, wait for sim thread to process it
-                self._req_queue.put(req)
-                result = self._resp_queue.get()
-
-                if req.op == MmioOp.READ:
-                    resp = result.to_bytes(req.size, byteorder="little")
-                    conn.sendall(resp)
-                else:
-                    conn.sendall(WRITE_ACK)
+                if req is None:
+                    logger.info("QemuBridge: recv returned None (client closed)")
+                    break
+                # Queue every header already buffered behind this one, so a
+                # pipelined write burst reaches the sim thread in one handoff
+                batch = [req]
+                while (len(self._rx_buf) >= HDR_SIZE and
+                       len(batch) < MAX_PENDING_ACKS):
+                    batch.append(self._recv_request(conn))
+                futs = []
+                for req in batch:
+                    msg_count += 1
+                    logger.debug("QemuBridge: rx #%d: %s", msg_count, req)
+                    fut = concurrent.futures.Future()
+                    self._req_queue.put((req, fut))
+                    futs.append(fut)
+                if self._closed:
+                    # The poll loop exited and may have drained the queue
+                    # before these arrived
+                    for fut in futs:
+                        fut.cancel()
+
+                # Responses go out in request order; write ACKs are held
+                # back until a read or the end of the batch
+                for req, fut in zip(batch, futs):
+                    result = fut.result()
+                    if req.op == MmioOp.READ:
+                        size = req.size
+                        conn.sendall(WRITE_ACK * pending_acks +
+                                     _PACK[size](result & _MASK[size]))
+                        pending_acks = 0
+                    else:
+                        pending_acks += 1
+                if pending_acks:
+                    conn.sendall(WRITE_ACK * pending_acks)
+                    pending_acks = 0
+        except concurrent.futures.CancelledError:
+            logger.info("QemuBridge: poll loop stopped, ending session")
         except (ConnectionError, OSError) as exc:
             logger.warning("QemuBridge: connection error: %s", exc)
         finally:
+            self._sel.unregister(conn)
+            self._sel.register(self._server_sock, selectors.EVENT_READ)
+            self._active_conn = None
             conn.close()
 
-    def _recv_exact(self, sock: socket.socket, n: int) -> bytes | None:
-        """Receive exactly n bytes.
+    def _recv_request(self, sock: socket.socket) -> MmioRequest | None:
+        """Receive and decode one request header.
+
+        Headers are decoded in place from a persistent receive buffer that is
+        refilled with one large recv, so back-to-back requests cost one
+        syscall and no intermediate bytes copy. Waits in the shared selector
+        until the socket is readable; a partial header just keeps waiting.
 
         Returns:
-            bytes: exactly n bytes of data
-            b"": timeout with no partial data (caller can retry)
-            None: client disconnected
+            MmioRequest: the next request
+            None: client disconnected or bridge stopped
+
+        Raises:
+            socket.timeout: select() timed out with no partial data (caller
+                decides whether the client is idle)
         """
-        buf = bytearray()
-        while len(buf) < n:
+        buf = self._rx_buf
+        while len(buf) < HDR_SIZE:
             if not self._running:
                 return None
-            try:
-                chunk = sock.recv(n - len(buf))
-            except socket.timeout:
+            events = self._sel.select(timeout=IDLE_TIMEOUT_S)
+            if not events:
                 if len(buf) == 0:
-                    return b""  # no partial data, safe to return timeout
+                    raise socket.timeout
                 continue  # partial message, keep trying
+            ready = {key.fileobj for key, _ in events}
+            if self._wake_r in ready:
+                self._clear_wake()
+            if sock not in ready:
+                continue
+            chunk = sock.recv(65536)
             if not chunk:
                 return None
-            buf.extend(chunk)
-        return bytes(buf)
+            buf += chunk
+            self._last_rx_ts = time.monotonic()
+        req = MmioRequest.unpack_from(buf)
+        del buf[:HDR_SIZE]
+        return req
+
+    def _wake(self):
+        """Wake the OS thread out of select(). Safe to call from any thread."""
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass  # already awake (buffer full) or shut down
+
+    def _clear_wake(self):
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
@@ -0,0 +1,22 @@
+# Socket option helpers shared by the bridges and the GPIO client.
+
+import socket
+
+
+def tune_socket(sock: socket.socket, sndbuf: int | None = None,
+                rcvbuf: int | None = None):
+    """Apply low-latency options to a stream socket.
+
+    TCP sockets get TCP_NODELAY so tiny request/response frames are not
+    held back by Nagle. Unix sockets have no Nagle to defeat, so they are
+    left alone unless buffer sizes are given: a large sndbuf/rcvbuf lets a
+    burst drain in one wakeup. Shrinking them would only cap how much can
+    be in flight before sendall() blocks.
+    """
+    if sock.family in (socket.AF_INET, socket.AF_INET6):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    elif sock.family == socket.AF_UNIX:
+        if sndbuf is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+        if rcvbuf is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
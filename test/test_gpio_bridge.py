@@ -15,16 +15,38 @@ from cocotb.clock import Clock
 from cocotb.triggers import RisingEdge, ClockCycles, Timer
 
 from cocotemu.axi_master import CocotemuAxiMaster
-from cocotemu.qemu_bridge import QemuBridge
+from cocotemu.qemu_bridge import QemuBridge, SOCK_BUF_SIZE
 from cocotemu.protocol import MmioOp, MmioRequest, WRITE_ACK
 from cocotemu.gpio_bridge import GpioBridge
 from cocotemu.gpio_protocol import GpioDir, GpioOp, GpioResp, GpioErr, GpioSignal
 from cocotemu.gpio_client import GpioClient
+from cocotemu.sockopt import tune_socket
 
 GPIO_SOCK_PATH = "/tmp/cocotemu_gpio_test.sock"
 QEMU_SOCK_PATH = "/tmp/cocotemu_qemu_gpio_test.sock"
 
 
+def _wait_connect(path, timeout=2.0):
+    """Connect to a bridge socket, polling every 1 ms until it is listening.
+
+    Returns the connected socket, or None if it never came up.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    tune_socket(sock, sndbuf=SOCK_BUF_SIZE, rcvbuf=SOCK_BUF_SIZE)
+    deadline = time.monotonic() + timeout
+    while True:
+        if os.path.exists(path):
+            try:
+                sock.connect(path)
+                return sock
+            except ConnectionRefusedError:
+                pass  # bound but not listening yet
+        if time.monotonic() > deadline:
+            sock.close()
+            return None
+        time.sleep(0.001)
+
+
 def gpio_basic_client(results_out):
     """Test LIST, GET, SET, direction enforcement."""
     try:
@@ -71,7 +93,7 @@ def gpio_basic_client(results_out):
 
 
 def gpio_subscribe_client(results_out, axi_sock_path):
-    """Test SUBSCRIBE: write reg0 via AXI → gpio_out changes → VALUE notification."""
+    """Test SUBSCRIBE: write reg0 via AXI → gpio_out changes → NOTIFY push."""
     try:
         client = GpioClient(sock_path=GPIO_SOCK_PATH)
         client.connect()
@@ -82,15 +104,8 @@ def gpio_subscribe_client(results_out, axi_sock_path):
 
         # Write 0x42 to reg0 via a separate QEMU-side AXI write
         # (this changes regs[0] which drives gpio_out)
-        axi_sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-        for _ in range(50):
-            try:
-                axi_sock.connect(axi_sock_path)
-                break
-            except (FileNotFoundError, ConnectionRefusedError):
-                time.sleep(0.05)
-        else:
-            axi_sock.close()
+        axi_sock = _wait_connect(axi_sock_path)
+        if axi_sock is None:
             results_out.append(("axi connect", False))
             client.close()
             return
@@ -100,7 +115,7 @@ def gpio_subscribe_client(results_out, axi_sock_path):
         ack = axi_sock.recv(1)
         results_out.append(("axi write ack", ack == WRITE_ACK))
 
-        # Now wait for VALUE notification
+        # Now wait for NOTIFY push
         idx, val = client.recv_notification(timeout=5.0)
         results_out.append(("notify idx == 0", idx == 0))
         results_out.append(("notify val == 0x42", val == 0x42))
@@ -115,28 +130,100 @@ def gpio_subscribe_client(results_out, axi_sock_path):
         results_out.append((f"exception: {exc}", False))
 
 
+def _wait_buffered(sock, n, timeout=2.0):
+    """Wait until at least n bytes sit unread in sock's receive buffer."""
+    deadline = time.monotonic() + timeout
+    while len(sock.recv(n, socket.MSG_PEEK)) < n:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"fewer than {n} bytes buffered")
+        time.sleep(0.001)
+
+
+def gpio_stash_client(results_out, axi_sock_path):
+    """Test notifications queued ahead of a GET/SET/SUBSCRIBE reply."""
+    try:
+        client = GpioClient(sock_path=GPIO_SOCK_PATH)
+        client.connect()
+
+        axi_sock = _wait_connect(axi_sock_path)
+        if axi_sock is None:
+            results_out.append(("axi connect", False))
+            client.close()
+            return
+
+        def write_reg0(val):
+            req = MmioRequest(MmioOp.WRITE, size=4, addr=0x00, val=val)
+            axi_sock.sendall(req.pack())
+            return axi_sock.recv(1) == WRITE_ACK
+
+        client.subscribe("gpio_out")
+
+        # GET: two notifications already sitting unread when it is sent
+        results_out.append(("axi write 0x07 ack", write_reg0(0x07)))
+        _wait_buffered(client._sock, 6)
+        results_out.append(("axi write 0x09 ack", write_reg0(0x09)))
+        _wait_buffered(client._sock, 12)
+        results_out.append(("get gpio_out == 0x09", client.get("gpio_out") == 0x09))
+        results_out.append(("stashed notify 0x07",
+                            client.recv_notification() == (0, 0x07)))
+        results_out.append(("stashed notify 0x09",
+                            client.recv_notification() == (0, 0x09)))
+
+        # SET / SUBSCRIBE: the notification lands just ahead of the ACK
+        results_out.append(("axi write 0x33 ack", write_reg0(0x33)))
+        client.set("gpio_in", 0x11)
+        results_out.append(("set gpio_in OK", True))
+        results_out.append(("axi write 0x44 ack", write_reg0(0x44)))
+        client.subscribe("gpio_out")
+        results_out.append(("resubscribe OK", True))
+        results_out.append(("stashed notify 0x33",
+                            client.recv_notification() == (0, 0x33)))
+        results_out.append(("stashed notify 0x44",
+                            client.recv_notification() == (0, 0x44)))
+
+        # GET behind a deep backlog of unread pushes must still see the
+        # live value, and every push must survive in order
+        acks = [write_reg0(i) for i in range(1, 301)]
+        results_out.append(("backlog axi writes ack", all(acks)))
+        # The kernel buffer holds fewer than 300 frames; the rest wait in
+        # the bridge until the GET reply drains the socket
+        _wait_buffered(client._sock, 200 * 6)
+        results_out.append(("backlog get gpio_out == 300 & 0xFF",
+                            client.get("gpio_out") == 300 & 0xFF))
+        backlog = []
+        try:
+            while True:
+                backlog.append(client.recv_notification(timeout=0.2))
+        except socket.timeout:
+            pass
+        results_out.append(("backlog notifications in order",
+                            backlog == [(0, i & 0xFF) for i in range(1, 301)]))
+
+        # No reply may be left behind posing as a notification
+        try:
+            client.recv_notification(timeout=0.2)
+            results_out.append(("no spurious notification", False))
+        except socket.timeout:
+            results_out.append(("no spurious notification", True))
+
+        axi_sock.close()
+        client.close()
+    except Exception as exc:
+        results_out.append((f"exception: {exc}", False))
+
+
 def gpio_set_read_axi_client(results_out, axi_sock_path):
     """Test SET gpio_in → read reg3 via AXI → value matches."""
     try:
         client = GpioClient(sock_path=GPIO_SOCK_PATH)
         client.connect()
 
-        # Drive gpio_in = 0x55
-        client.set("gpio_in", 0x55)
-
-        # Give sim time to latch (small delay, sim keeps advancing)
-        time.sleep(0.2)
+        # Drive gpio_in = 0x55 and wait for the clock edge that latches it
+        client.set("gpio_in", 0x55, sync=True)
 
         # Read reg3 via AXI
-        axi_sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-        for _ in range(50):
-            try:
-                axi_sock.connect(axi_sock_path)
-                break
-            except (FileNotFoundError, ConnectionRefusedError):
-                time.sleep(0.05)
-        else:
-            axi_sock.close()
+        axi_sock = _wait_connect(axi_sock_path)
+        if axi_sock is None:
             results_out.append(("axi connect", False))
             client.close()
             return
@@ -175,15 +262,10 @@ async def test_gpio_basic(dut):
     await reset_dut(dut)
 
     signals = _make_gpio_signals(dut)
-    bridge = GpioBridge(signals, sock_path=GPIO_SOCK_PATH)
+    bridge = GpioBridge(signals, sock_path=GPIO_SOCK_PATH, clock=dut.aclk)
     cocotb.start_soon(bridge.start())
 
-    # Wait for socket
-    for _ in range(100):
-        await Timer(1, units="us")
-        if os.path.exists(GPIO_SOCK_PATH):
-            break
-    assert os.path.exists(GPIO_SOCK_PATH), "GPIO socket never appeared"
+    await bridge.await_ready()
 
     results = []
     t = threading.Thread(target=gpio_basic_client, args=(results,))
@@ -206,7 +288,7 @@ async def test_gpio_basic(dut):
 
 @cocotb.test(timeout_time=30, timeout_unit="sec")
 async def test_gpio_subscribe(dut):
-    """SUBSCRIBE → AXI write to reg0 → gpio_out changes → client gets VALUE."""
+    """SUBSCRIBE → AXI write to reg0 → gpio_out changes → client gets NOTIFY."""
     clock = Clock(dut.aclk, 10, units="ns")
     cocotb.start_soon(clock.start())
     await reset_dut(dut)
@@ -214,20 +296,14 @@ async def test_gpio_subscribe(dut):
     axi = CocotemuAxiMaster(dut)
     signals = _make_gpio_signals(dut)
 
-    gpio_bridge = GpioBridge(signals, sock_path=GPIO_SOCK_PATH)
+    gpio_bridge = GpioBridge(signals, sock_path=GPIO_SOCK_PATH, clock=dut.aclk)
     qemu_bridge = QemuBridge(axi.execute, sock_path=QEMU_SOCK_PATH)
 
     cocotb.start_soon(gpio_bridge.start())
     cocotb.start_soon(qemu_bridge.start())
 
-    for _ in range(100):
-        await Timer(1, units="us")
-        if (os.path.exists(GPIO_SOCK_PATH) and
-                os.path.exists(QEMU_SOCK_PATH)):
-            break
-
-    assert os.path.exists(GPIO_SOCK_PATH), "GPIO socket never appeared"
-    assert os.path.exists(QEMU_SOCK_PATH), "QEMU socket never appeared"
+    await gpio_bridge.await_ready()
+    await qemu_bridge.await_ready()
 
     results = []
     t = threading.Thread(target=gpio_subscribe_client,
@@ -250,6 +326,46 @@ async def test_gpio_subscribe(dut):
     assert not failures, f"Failed: {failures}"
 
 
+@cocotb.test(timeout_time=30, timeout_unit="sec")
+async def test_gpio_notification_stash(dut):
+    """Notifications queued ahead of a command reply are stashed, not taken as it."""
+    clock = Clock(dut.aclk, 10, units="ns")
+    cocotb.start_soon(clock.start())
+    await reset_dut(dut)
+
+    axi = CocotemuAxiMaster(dut)
+    signals = _make_gpio_signals(dut)
+
+    gpio_bridge = GpioBridge(signals, sock_path=GPIO_SOCK_PATH, clock=dut.aclk)
+    qemu_bridge = QemuBridge(axi.execute, sock_path=QEMU_SOCK_PATH)
+
+    cocotb.start_soon(gpio_bridge.start())
+    cocotb.start_soon(qemu_bridge.start())
+
+    await gpio_bridge.await_ready()
+    await qemu_bridge.await_ready()
+
+    results = []
+    t = threading.Thread(target=gpio_stash_client,
+                         args=(results, QEMU_SOCK_PATH))
+    t.start()
+
+    while t.is_alive():
+        await Timer(100, units="ns")
+    t.join()
+
+    gpio_bridge.stop()
+    qemu_bridge.stop()
+
+    for desc, passed in results:
+        status = "PASS" if passed else "FAIL"
+        dut._log.info(f"  [{status}] {desc}")
+
+    assert results, "No results from client"
+    failures = [desc for desc, passed in results if not passed]
+    assert not failures, f"Failed: {failures}"
+
+
 @cocotb.test(timeout_time=30, timeout_unit="sec")
 async def test_gpio_set_read_axi(dut):
     """SET gpio_in → read reg3 via AXI → value matches."""
@@ -260,20 +376,14 @@ async def test_gpio_set_read_axi(dut):
     axi = CocotemuAxiMaster(dut)
     signals = _make_gpio_signals(dut)
 
-    gpio_bridge = GpioBridge(signals, sock_path=GPIO_SOCK_PATH)
+    gpio_bridge = GpioBridge(signals, sock_path=GPIO_SOCK_PATH, clock=dut.aclk)
     qemu_bridge = QemuBridge(axi.execute, sock_path=QEMU_SOCK_PATH)
 
     cocotb.start_soon(gpio_bridge.start())
     cocotb.start_soon(qemu_bridge.start())
 
-    for _ in range(100):
-        await Timer(1, units="us")
-        if (os.path.exists(GPIO_SOCK_PATH) and
-                os.path.exists(QEMU_SOCK_PATH)):
-            break
-
-    assert os.path.exists(GPIO_SOCK_PATH), "GPIO socket never appeared"
-    assert os.path.exists(QEMU_SOCK_PATH), "QEMU socket never appeared"
+    await gpio_bridge.await_ready()
+    await qemu_bridge.await_ready()
 
     results = []
     t = threading.Thread(target=gpio_set_read_axi_client,
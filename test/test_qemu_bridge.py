@@ -1,7 +1,6 @@
 # Replicate QEMU to check the logic
 # replicate the mmio_stub_msg_hdr driver
 
-import os
 import socket
 import time
 import threading
@@ -15,9 +14,21 @@ from cocotemu.qemu_bridge import QemuBridge
 from cocotemu.protocol import MmioOp, MmioRequest, WRITE_ACK
 
 SOCK_PATH = "/tmp/cocotemu_test.sock"
+RECONNECT_SOCK_PATH = "/tmp/cocotemu_reconnect_test.sock"
 
 
-def fake_qemu_client(results_out):
+def _recv_exact(sock, n):
+    """Receive exactly n bytes."""
+    buf = b""
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("bridge closed the connection")
+        buf += chunk
+    return buf
+
+
+def fake_qemu_client(results_out, sock_path=SOCK_PATH):
     """
     Blocking function that acts as QEMU's mmio-stub chardev.
 
@@ -28,7 +39,7 @@ def fake_qemu_client(results_out):
     sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
     for attempt in range(50):
         try:
-            sock.connect(SOCK_PATH)
+            sock.connect(sock_path)
             break
         except (FileNotFoundError, ConnectionRefusedError):
             time.sleep(0.05)
@@ -38,41 +49,40 @@ def fake_qemu_client(results_out):
         return
 
     try:
-        # --- Write 0xDEADBEEF to reg0 (offset 0x00) ---
-        req = MmioRequest(MmioOp.WRITE, size=4, addr=0x00, val=0xDEADBEEF)
-        sock.sendall(req.pack())
-        ack = sock.recv(1)
-        results_out.append(("write reg0 ack", ack == WRITE_ACK))
-
-        # --- Write 0xCAFEBABE to reg1 (offset 0x04) ---
-        req = MmioRequest(MmioOp.WRITE, size=4, addr=0x04, val=0xCAFEBABE)
-        sock.sendall(req.pack())
-        ack = sock.recv(1)
-        results_out.append(("write reg1 ack", ack == WRITE_ACK))
+        # --- Write 0xDEADBEEF to reg0, 0xCAFEBABE to reg1 (one send) ---
+        # Back-to-back writes go out together; the bridge may coalesce
+        # their ACKs, so read both at once
+        hdrs = [
+            MmioRequest(MmioOp.WRITE, size=4, addr=0x00, val=0xDEADBEEF).pack(),
+            MmioRequest(MmioOp.WRITE, size=4, addr=0x04, val=0xCAFEBABE).pack(),
+        ]
+        sock.sendall(b"".join(hdrs))
+        acks = _recv_exact(sock, len(hdrs))
+        results_out.append(("write reg0/reg1 acks", acks == WRITE_ACK * len(hdrs)))
 
         # --- Read back reg0 ---
         req = MmioRequest(MmioOp.READ, size=4, addr=0x00)
         sock.sendall(req.pack())
-        data = sock.recv(4)
+        data = _recv_exact(sock, 4)
         val = int.from_bytes(data, "little")
         results_out.append(("read reg0 == 0xDEADBEEF", val == 0xDEADBEEF))
 
         # --- Read back reg1 ---
         req = MmioRequest(MmioOp.READ, size=4, addr=0x04)
         sock.sendall(req.pack())
-        data = sock.recv(4)
+        data = _recv_exact(sock, 4)
         val = int.from_bytes(data, "little")
         results_out.append(("read reg1 == 0xCAFEBABE", val == 0xCAFEBABE))
 
         # --- Write then read reg2 with 16-bit access ---
         req = MmioRequest(MmioOp.WRITE, size=2, addr=0x08, val=0x1234)
         sock.sendall(req.pack())
-        ack = sock.recv(1)
+        ack = _recv_exact(sock, 1)
         results_out.append(("write reg2 half ack", ack == WRITE_ACK))
 
         req = MmioRequest(MmioOp.READ, size=4, addr=0x08)
         sock.sendall(req.pack())
-        data = sock.recv(4)
+        data = _recv_exact(sock, 4)
         val = int.from_bytes(data, "little")
         results_out.append(("read reg2 after half-write == 0x1234", val == 0x00001234))
 
@@ -103,15 +113,9 @@ async def test_qemu_bridge_roundtrip(dut):
     # Start bridge in background (poll loop runs as cocotb coroutine)
     cocotb.start_soon(bridge.start())
 
-    # Give the daemon thread time to bind the socket
-    # (Timer advances sim time, releasing the GIL so the OS thread can run)
-    for _ in range(100):
-        await Timer(1, units="us")
-        if os.path.exists(SOCK_PATH):
-            break
-
-    assert os.path.exists(SOCK_PATH), f"Socket {SOCK_PATH} never appeared"
-    dut._log.info("Socket appeared, starting fake client")
+    # Wait for the daemon thread to bind and listen
+    await bridge.await_ready()
+    dut._log.info("Socket listening, starting fake client")
 
     # Run fake client in a plain thread
     results = []
@@ -135,3 +139,38 @@ async def test_qemu_bridge_roundtrip(dut):
     assert results, "No results from fake client (did it crash?)"
     failures = [desc for desc, passed in results if not passed]
     assert not failures, f"Failed checks: {failures}"
+
+
+@cocotb.test(timeout_time=30, timeout_unit="sec")
+async def test_qemu_bridge_reconnect(dut):
+    """With reaccept=True, a second client is served after the first disconnects."""
+
+    clock = Clock(dut.aclk, 10, units="ns")
+    cocotb.start_soon(clock.start())
+    await reset_dut(dut)
+
+    axi = CocotemuAxiMaster(dut)
+    bridge = QemuBridge(axi.execute, sock_path=RECONNECT_SOCK_PATH,
+                        reaccept=True)
+    cocotb.start_soon(bridge.start())
+    await bridge.await_ready()
+
+    # Two back-to-back sessions against the same bridge
+    results = []
+    for _ in range(2):
+        client_thread = threading.Thread(target=fake_qemu_client,
+                                         args=(results, RECONNECT_SOCK_PATH))
+        client_thread.start()
+        while client_thread.is_alive():
+            await Timer(100, units="ns")
+        client_thread.join()
+
+    bridge.stop()
+
+    for desc, passed in results:
+        status = "PASS" if passed else "FAIL"
+        dut._log.info(f"  [{status}] {desc}")
+
+    assert results, "No results from fake client (did it crash?)"
+    failures = [desc for desc, passed in results if not passed]
+    assert not failures, f"Failed checks: {failures}"